@@ -1,6 +1,10 @@
 import sqlite3
 import logging
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from enum import IntEnum
+from queue import Queue
+from threading import RLock
+from typing import List, Optional
 
 # Initialize logging
 logging.basicConfig(
@@ -9,69 +13,211 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class Priority(IntEnum):
+    """Task priorities, ordered so higher sorts first"""
+    HIGH = 3
+    MEDIUM = 2
+    LOW = 1
+
+# Priorities are stored as integers so the covering index can satisfy
+# ORDER BY without a sort; strings are translated at the SQL boundary
+_PRIO_TO_INT = {'High': Priority.HIGH, 'Medium': Priority.MEDIUM, 'Low': Priority.LOW}
+
+# Reader connections pooled alongside the single writer; WAL lets these
+# run queries while the writer commits
+_READ_POOL_SIZE = 4
+_PRIO_CASE = "CASE priority WHEN 3 THEN 'High' WHEN 2 THEN 'Medium' ELSE 'Low' END AS priority"
+
+# SQL hoisted to constants so sqlite3's statement cache keys on the same
+# string objects every call and never re-parses these queries
+_SQL_INSERT = 'INSERT INTO tasks (description, priority, created_by) VALUES (?, ?, ?)'
+_SQL_SELECT_ALL = f'SELECT id, description, {_PRIO_CASE}, created_by FROM tasks ORDER BY tasks.priority DESC, created_at'
+_SQL_SELECT_ONE = f'SELECT id, description, {_PRIO_CASE}, created_by FROM tasks WHERE id = ?'
+_SQL_SELECT_SUMMARIES = f'SELECT id, substr(description, 1, 20) AS description, {_PRIO_CASE} FROM tasks ORDER BY tasks.priority DESC, created_at'
+_SQL_UPDATE_DESCRIPTION = 'UPDATE tasks SET description = ? WHERE id = ?'
+_SQL_UPDATE_PRIORITY = 'UPDATE tasks SET priority = ? WHERE id = ?'
+_SQL_DELETE = 'DELETE FROM tasks WHERE id = ?'
+_SQL_UPSERT_USER = "INSERT OR REPLACE INTO users (id, last_seen) VALUES (?, strftime('%s', 'now'))"
+_SQL_SELECT_USER_IDS = 'SELECT id FROM users'
+_SQL_DELETE_RETURNING = f'DELETE FROM tasks WHERE id = ? RETURNING id, description, {_PRIO_CASE}, created_by'
+_SQL_UPDATE_PRIORITY_RETURNING = f'UPDATE tasks SET priority = ? WHERE id = ? RETURNING id, description, {_PRIO_CASE}, created_by'
+
 class TaskDB:
+    # Database files already initialized by this process, so repeated
+    # TaskDB() constructions skip the schema DDL round-trip
+    _initialized: set = set()
+
     def __init__(self, db_name: str = 'tasks.db'):
         self.db_name = db_name
+        # One long-lived connection keeps SQLite's page cache warm across
+        # calls; writes are serialized through the lock while WAL lets
+        # reads proceed concurrently on the same handle
+        self._conn = self._configure(
+            sqlite3.connect(
+                self.db_name,
+                check_same_thread=False,
+                cached_statements=256,
+                # Autocommit: single statements commit at the C level with
+                # no Python-side BEGIN/COMMIT bookkeeping; batch() opens
+                # explicit transactions when grouping is needed
+                isolation_level=None
+            )
+        )
+        self._write_lock = RLock()
+        self._read_pool: Queue = Queue()
+        for _ in range(_READ_POOL_SIZE):
+            self._read_pool.put(self._configure(
+                sqlite3.connect(self.db_name, check_same_thread=False, cached_statements=256)
+            ))
+        # Bumped by _invalidate; readers only store a snapshot if no
+        # mutation landed while their SELECT ran on a worker thread
+        self._cache_gen = 0
+        # Cached result of get_all_tasks, invalidated by every mutation
+        self._all_tasks_cache: Optional[List[sqlite3.Row]] = None
+        # Per-id cache for get_task, invalidated on mutation of that id
+        self._task_cache: dict = {}
+        # Cached truncated rows for menu keyboards, invalidated with the
+        # task list
+        self._summaries_cache: Optional[List[sqlite3.Row]] = None
         self._init_db()
 
     def _init_db(self):
         """Initialize the database with required tables"""
-        with self._get_connection() as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    description TEXT NOT NULL,
-                    priority TEXT NOT NULL,
-                    created_by TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.commit()
+        if self.db_name in TaskDB._initialized:
+            return
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                description TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                created_by TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tasks_prio_time
+            ON tasks(priority DESC, created_at)
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                last_seen INTEGER DEFAULT (strftime('%s', 'now'))
+            )
+        ''')
+        # Databases created before priorities went INTEGER still hold
+        # 'High'/'Medium'/'Low' strings; rewrite them so old rows decode
+        # and sort like new ones. Matching the names (not typeof) keeps
+        # this a no-op on later starts: the legacy column has TEXT
+        # affinity, so the integers are re-stored as '3'/'2'/'1' — which
+        # compare and sort correctly, but would hit the ELSE branch if
+        # rewritten again
+        self._conn.execute('''
+            UPDATE tasks SET priority = CASE priority
+                WHEN 'High' THEN 3 WHEN 'Medium' THEN 2 ELSE 1 END
+            WHERE priority IN ('High', 'Medium', 'Low')
+        ''')
+        # WAL is persistent on the database file, so every later
+        # connection inherits it without re-running this PRAGMA
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        TaskDB._initialized.add(self.db_name)
 
-    def _get_connection(self):
-        """Get a new database connection"""
-        return sqlite3.connect(self.db_name)
+    @contextmanager
+    def batch(self):
+        """Run several mutations in one transaction (one fsync for all)"""
+        with self._write_lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            finally:
+                self._invalidate()
+
+    def _invalidate(self, task_id: Optional[int] = None):
+        """Drop cached reads after a mutation"""
+        self._cache_gen += 1
+        self._all_tasks_cache = None
+        self._summaries_cache = None
+        if task_id is None:
+            self._task_cache.clear()
+        else:
+            self._task_cache.pop(task_id, None)
+
+    @contextmanager
+    def _read_conn(self):
+        """Borrow a pooled read connection"""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
+    def _configure(self, conn):
+        """Apply per-connection performance settings"""
+        # Row supports both index and key access, so callers keep using
+        # task['description'] while we skip building a dict per row
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-64000')
+        return conn
 
     def add_task(self, description: str, priority: str, created_by: str) -> bool:
         """Add a new shared task"""
         try:
-            with self._get_connection() as conn:
-                conn.execute(
-                    'INSERT INTO tasks (description, priority, created_by) VALUES (?, ?, ?)',
-                    (description, priority, created_by)
+            with self._write_lock:
+                self._conn.execute(
+                    _SQL_INSERT,
+                    (description, _PRIO_TO_INT[priority], created_by)
                 )
-                conn.commit()
+                self._invalidate()
             return True
         except Exception as e:
             logger.error(f"Error adding task: {e}")
             return False
 
-    def get_all_tasks(self) -> List[Dict]:
+    def get_all_tasks(self) -> List[sqlite3.Row]:
         """Get all tasks for all users"""
+        cached = self._all_tasks_cache
+        if cached is not None:
+            return cached
         try:
-            with self._get_connection() as conn:
-                cursor = conn.execute(
-                    'SELECT id, description, priority, created_by FROM tasks ORDER BY priority DESC, created_at'
-                )
-                return [{
-                    'id': row[0],
-                    'description': row[1],
-                    'priority': row[2],
-                    'created_by': row[3]
-                } for row in cursor.fetchall()]
+            gen = self._cache_gen
+            with self._read_conn() as conn:
+                rows = list(conn.execute(_SQL_SELECT_ALL))
+            with self._write_lock:
+                if gen == self._cache_gen:
+                    self._all_tasks_cache = rows
+            return rows
         except Exception as e:
             logger.error(f"Error getting tasks: {e}")
             return []
 
+    def get_task_summaries(self) -> List[sqlite3.Row]:
+        """Get id, truncated description, and priority for menu keyboards"""
+        cached = self._summaries_cache
+        if cached is not None:
+            return cached
+        try:
+            gen = self._cache_gen
+            with self._read_conn() as conn:
+                rows = list(conn.execute(_SQL_SELECT_SUMMARIES))
+            with self._write_lock:
+                if gen == self._cache_gen:
+                    self._summaries_cache = rows
+            return rows
+        except Exception as e:
+            logger.error(f"Error getting task summaries: {e}")
+            return []
+
     def update_task_description(self, task_id: int, new_description: str) -> bool:
         """Update a task's description"""
         try:
-            with self._get_connection() as conn:
-                conn.execute(
-                    'UPDATE tasks SET description = ? WHERE id = ?',
-                    (new_description, task_id)
-                )
-                conn.commit()
+            with self._write_lock:
+                self._conn.execute(_SQL_UPDATE_DESCRIPTION, (new_description, task_id))
+                self._invalidate(task_id)
             return True
         except Exception as e:
             logger.error(f"Error updating task description: {e}")
@@ -80,45 +226,84 @@ class TaskDB:
     def update_task_priority(self, task_id: int, new_priority: str) -> bool:
         """Update a task's priority"""
         try:
-            with self._get_connection() as conn:
-                conn.execute(
-                    'UPDATE tasks SET priority = ? WHERE id = ?',
-                    (new_priority, task_id)
-                )
-                conn.commit()
+            with self._write_lock:
+                self._conn.execute(_SQL_UPDATE_PRIORITY, (_PRIO_TO_INT[new_priority], task_id))
+                self._invalidate(task_id)
             return True
         except Exception as e:
             logger.error(f"Error updating task priority: {e}")
             return False
 
+    def update_task_priority_returning(self, task_id: int, new_priority: str) -> Optional[sqlite3.Row]:
+        """Update a task's priority and return the updated row in one statement"""
+        try:
+            with self._write_lock:
+                cursor = self._conn.execute(
+                    _SQL_UPDATE_PRIORITY_RETURNING, (_PRIO_TO_INT[new_priority], task_id)
+                )
+                row = cursor.fetchone()
+                self._invalidate(task_id)
+            return row
+        except Exception as e:
+            logger.error(f"Error updating task priority: {e}")
+            return None
+
     def delete_task(self, task_id: int) -> bool:
         """Delete a task"""
         try:
-            with self._get_connection() as conn:
-                conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-                conn.commit()
+            with self._write_lock:
+                self._conn.execute(_SQL_DELETE, (task_id,))
+                self._invalidate(task_id)
             return True
         except Exception as e:
             logger.error(f"Error deleting task: {e}")
             return False
 
-    def get_task(self, task_id: int) -> Optional[Dict]:
-        """Get a single task by ID"""
+    def delete_task_returning(self, task_id: int) -> Optional[sqlite3.Row]:
+        """Delete a task and return the deleted row in one statement"""
         try:
-            with self._get_connection() as conn:
-                cursor = conn.execute(
-                    'SELECT id, description, priority, created_by FROM tasks WHERE id = ?',
-                    (task_id,)
-                )
+            with self._write_lock:
+                cursor = self._conn.execute(_SQL_DELETE_RETURNING, (task_id,))
                 row = cursor.fetchone()
-                if row:
-                    return {
-                        'id': row[0],
-                        'description': row[1],
-                        'priority': row[2],
-                        'created_by': row[3]
-                    }
-                return None
+                self._invalidate(task_id)
+            return row
+        except Exception as e:
+            logger.error(f"Error deleting task: {e}")
+            return None
+
+    def upsert_user(self, user_id: int) -> bool:
+        """Record a user as active so notifications survive restarts"""
+        try:
+            with self._write_lock:
+                self._conn.execute(_SQL_UPSERT_USER, (user_id,))
+            return True
+        except Exception as e:
+            logger.error(f"Error upserting user: {e}")
+            return False
+
+    def all_user_ids(self) -> List[int]:
+        """Get the IDs of all users who have ever started the bot"""
+        try:
+            with self._read_conn() as conn:
+                return [row[0] for row in conn.execute(_SQL_SELECT_USER_IDS)]
+        except Exception as e:
+            logger.error(f"Error getting user ids: {e}")
+            return []
+
+    def get_task(self, task_id: int) -> Optional[sqlite3.Row]:
+        """Get a single task by ID"""
+        row = self._task_cache.get(task_id)
+        if row is not None:
+            return row
+        try:
+            gen = self._cache_gen
+            with self._read_conn() as conn:
+                row = conn.execute(_SQL_SELECT_ONE, (task_id,)).fetchone()
+            if row is not None:
+                with self._write_lock:
+                    if gen == self._cache_gen:
+                        self._task_cache[task_id] = row
+            return row
         except Exception as e:
             logger.error(f"Error getting task: {e}")
             return None
@@ -1,7 +1,13 @@
+import asyncio
 import os
-from flask import Flask, jsonify
+import queue
+from collections import defaultdict
+from functools import lru_cache, wraps
+from textwrap import dedent
+from aiohttp import web
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     MessageHandler,
@@ -10,18 +16,35 @@ from telegram.ext import (
     filters
 )
 import logging
-from threading import Thread
-from database import TaskDB
+from logging.handlers import QueueHandler, QueueListener
+from database import Priority, TaskDB
+
+# uvloop swaps in libuv's event loop for lower per-syscall overhead on
+# the bot's many small socket reads/writes; optional on platforms
+# without a wheel
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
 
 # Initialize logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
-logger = logging.getLogger(__name__)
 
-# Initialize Flask app for health check
-app = Flask(__name__)
+# Route records through a queue so handlers only enqueue; formatting and
+# the blocking stderr write happen on the listener's background thread
+_log_queue = queue.SimpleQueue()
+_root_logger = logging.getLogger()
+_log_listener = QueueListener(
+    _log_queue, *_root_logger.handlers, respect_handler_level=True
+)
+_root_logger.handlers = [QueueHandler(_log_queue)]
+_log_listener.start()
+
+logger = logging.getLogger(__name__)
 
 # Initialize database
 task_db = TaskDB()
@@ -31,34 +54,17 @@ active_users = set()
 
 # Constants
 PRIORITIES = ['High', 'Medium', 'Low']
+PRIORITY_ICON = {'High': '🔴', 'Medium': '🟡', 'Low': '🟢'}
+# Single-digit codes keep priority callback_data compact on the wire
+PRIORITY_FROM_CODE = {str(p.value): p.name.capitalize() for p in Priority}
 
-# Health check endpoint
-@app.route('/health')
-def health_check():
-    return jsonify({"status": "healthy"}), 200
-
-async def notify_all_users(context: ContextTypes.DEFAULT_TYPE, message: str, exclude_user_id: str = None):
-    """Notify all active users except the excluded one"""
-    for user_id in active_users:
-        if user_id != exclude_user_id:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text=message
-                )
-            except Exception as e:
-                logger.error(f"Failed to notify user {user_id}: {e}")
-
-# Telegram Bot Commands
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = str(update.effective_user.id)
-    active_users.add(user_id)
-    
-    help_text = """
+# Static command responses, dedented and wrapped in their send kwargs
+# once at import time
+START_TEXT = dedent("""\
     📝 *Shared Task Manager Bot* 📝
-    
+
     *All users see and manage the same task list*
-    
+
     *Commands:*
     /start - Show this message
     /add - Add a new task (notifies everyone)
@@ -66,184 +72,293 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     /edit - Edit a task
     /delete - Delete a task
     /help - Show help
-    
+
     Tasks can have High, Medium, or Low priority.
-    """
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    """).strip()
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    help_text = """
+HELP_TEXT = dedent("""\
     📝 *Available Commands* 📝
-    
+
     */add* - Add a new shared task (notifies all users)
     */list* - Show all tasks
     */edit* - Edit an existing task
     */delete* - Remove a task
     */help* - Show this help message
-    
+
     All changes are visible to everyone immediately!
-    """
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    """).strip()
+
+_START_KWARGS = dict(text=START_TEXT, parse_mode='Markdown', disable_web_page_preview=True)
+_HELP_KWARGS = dict(text=HELP_TEXT, parse_mode='Markdown', disable_web_page_preview=True)
+
+# The add-flow priority keyboard never changes, so build it once at
+# import time; the edit-flow variant only varies by task id and is
+# cached per id below
+ADD_PRIORITY_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("High 🔴", callback_data='priority_High')],
+    [InlineKeyboardButton("Medium 🟡", callback_data='priority_Medium')],
+    [InlineKeyboardButton("Low 🟢", callback_data='priority_Low')]
+])
+
+@lru_cache(maxsize=4096)
+def _edit_select_cb(task_id: int) -> str:
+    return f'edit_{task_id}_select'
+
+@lru_cache(maxsize=4096)
+def _delete_cb(task_id: int) -> str:
+    return f'delete_{task_id}'
+
+@lru_cache(maxsize=1024)
+def edit_options_keyboard(task_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Edit Description", callback_data=f'edit_{task_id}_description'),
+            InlineKeyboardButton("Edit Priority", callback_data=f'edit_{task_id}_priority')
+        ],
+        [InlineKeyboardButton("Cancel", callback_data=f'edit_{task_id}_cancel')]
+    ])
+
+@lru_cache(maxsize=1024)
+def edit_priority_keyboard(task_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("High 🔴", callback_data=f'edit_{task_id}_sp_{Priority.HIGH.value}')],
+        [InlineKeyboardButton("Medium 🟡", callback_data=f'edit_{task_id}_sp_{Priority.MEDIUM.value}')],
+        [InlineKeyboardButton("Low 🟢", callback_data=f'edit_{task_id}_sp_{Priority.LOW.value}')]
+    ])
+
+# Health check endpoint, served from the bot's own event loop; the
+# payload never changes, so it is serialized once at import time
+_HEALTH_BODY = b'{"status": "healthy"}'
+
+async def health_check(request):
+    return web.Response(body=_HEALTH_BODY, content_type='application/json')
+
+async def start_health_server(application):
+    """Start the aiohttp health-check server on the bot's event loop"""
+    port = int(os.getenv('PORT', 8000))
+    health_app = web.Application()
+    health_app.router.add_get('/health', health_check)
+    # Probes arrive constantly, so skip access logging for them
+    runner = web.AppRunner(health_app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', port)
+    await site.start()
+    logger.info(f"Health check server listening on port {port}")
+
+# SQLite work runs in worker threads via asyncio.to_thread so queries
+# never block the event loop; the reader pool in TaskDB lets those
+# threads actually overlap under WAL
+
+async def notify_all_users(context: ContextTypes.DEFAULT_TYPE, message: str, exclude_user_id: int = None):
+    """Notify all active users except the excluded one"""
+    async def _send(user_id: int):
+        try:
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=message
+            )
+        except Exception as e:
+            logger.error(f"Failed to notify user {user_id}: {e}")
+
+    # Exclude with one set difference up front instead of a comparison
+    # per user, then send concurrently; the application's rate limiter
+    # paces the actual API calls under Telegram's limits
+    targets = active_users - ({exclude_user_id} if exclude_user_id else set())
+    await asyncio.gather(
+        *[_send(user_id) for user_id in targets],
+        return_exceptions=True
+    )
+
+# Telegram Bot Commands
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    active_users.add(user_id)
+    await asyncio.to_thread(task_db.upsert_user, user_id)
+
+    await update.message.reply_text(**_START_KWARGS)
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(**_HELP_KWARGS)
 
 async def add_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['awaiting_task'] = True
-    await update.message.reply_text("Please enter the task description (visible to all users):")
+    async with _user_locks[update.effective_user.id]:
+        conv = context.user_data.get('conv')
+        if conv and conv.get('awaiting_task'):
+            # Already prompted; a repeated /add would only send the same
+            # prompt again
+            return
+
+        # Transient conversation state lives in one 'conv' sub-dict so it
+        # can be discarded with a single pop instead of per-key deletes
+        context.user_data['conv'] = {'awaiting_task': True}
+        await update.message.reply_text("Please enter the task description (visible to all users):")
 
 async def receive_task_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if 'awaiting_task' in context.user_data:
-        context.user_data['task_description'] = update.message.text
-        context.user_data['awaiting_task'] = False
-        context.user_data['awaiting_priority'] = True
-        
-        keyboard = [
-            [InlineKeyboardButton("High 🔴", callback_data='priority_High')],
-            [InlineKeyboardButton("Medium 🟡", callback_data='priority_Medium')],
-            [InlineKeyboardButton("Low 🟢", callback_data='priority_Low')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+    conv = context.user_data.get('conv')
+    if conv and conv.get('awaiting_task'):
+        context.user_data['conv'] = {
+            'task_description': update.message.text,
+            'awaiting_priority': True
+        }
+
         await update.message.reply_text(
             "Please select the task priority:",
-            reply_markup=reply_markup
+            reply_markup=ADD_PRIORITY_KEYBOARD
         )
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    
-    user_id = str(query.from_user.id)
-    data = query.data
-    
-    if data.startswith('priority_'):
-        priority = data.split('_')[1]
-        if 'task_description' in context.user_data:
-            description = context.user_data['task_description']
-            creator_name = update.effective_user.full_name
-            
-            if task_db.add_task(description, priority, creator_name):
-                # Notify all users about the new task
-                notification = (
-                    f"📢 New shared task added by {creator_name}:\n\n"
-                    f"*{description}*\n"
-                    f"Priority: {priority}"
-                )
-                await notify_all_users(
-                    context,
-                    notification,
-                    exclude_user_id=user_id
-                )
-                
-                await query.edit_message_text(
-                    f"✅ Task added with {priority} priority!\n"
-                    f"All users have been notified."
-                )
-            else:
-                await query.edit_message_text("⚠️ Failed to add task. Please try again.")
-            
-            # Clean up context
-            if 'task_description' in context.user_data:
-                del context.user_data['task_description']
-            if 'awaiting_priority' in context.user_data:
-                del context.user_data['awaiting_priority']
-    
-    elif data.startswith('delete_'):
-        task_id = int(data.split('_')[1])
-        task = task_db.get_task(task_id)
-        
-        if task:
-            if task_db.delete_task(task_id):
-                await query.edit_message_text(f"🗑 Task deleted: {task['description']}")
-                
-                # Notify about deletion
-                notification = (
-                    f"🗑 Task deleted by {update.effective_user.full_name}:\n\n"
-                    f"*{task['description']}*"
-                )
-                await notify_all_users(context, notification, exclude_user_id=user_id)
-            else:
-                await query.edit_message_text("⚠️ Failed to delete task. Please try again.")
-        else:
-            await query.edit_message_text("⚠️ Task not found!")
-    
-    elif data.startswith('edit_'):
-        parts = data.split('_')
-        task_id = int(parts[1])
-        action = parts[2]
-        task = task_db.get_task(task_id)
-        
-        if not task:
-            await query.edit_message_text("⚠️ Task not found!")
-            return
-        
-        if action == 'select':
-            keyboard = [
-                [
-                    InlineKeyboardButton("Edit Description", callback_data=f'edit_{task_id}_description'),
-                    InlineKeyboardButton("Edit Priority", callback_data=f'edit_{task_id}_priority')
-                ],
-                [InlineKeyboardButton("Cancel", callback_data=f'edit_{task_id}_cancel')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(
-                f"What would you like to edit for this task?\n\n"
-                f"Current: *{task['description']}* ({task['priority']} priority)",
-                reply_markup=reply_markup,
-                parse_mode='Markdown'
+async def _handle_priority(update: Update, context: ContextTypes.DEFAULT_TYPE, query, payload: str):
+    """Handle 'priority_<High|Medium|Low>' from the add-task flow"""
+    priority = payload
+    conv = context.user_data.get('conv')
+    if conv and 'task_description' in conv:
+        description = conv['task_description']
+        creator_name = update.effective_user.full_name
+
+        if await asyncio.to_thread(task_db.add_task, description, priority, creator_name):
+            # Notify all users about the new task
+            notification = (
+                f"📢 New shared task added by {creator_name}:\n\n"
+                f"*{description}*\n"
+                f"Priority: {priority}"
+            )
+            await notify_all_users(
+                context,
+                notification,
+                exclude_user_id=query.from_user.id
             )
-        
-        elif action == 'description':
-            context.user_data['editing_task'] = task_id
-            context.user_data['editing_field'] = 'description'
-            await query.edit_message_text("Please send the new task description:")
-        
-        elif action == 'priority':
-            keyboard = [
-                [InlineKeyboardButton("High 🔴", callback_data=f'edit_{task_id}_setpriority_High')],
-                [InlineKeyboardButton("Medium 🟡", callback_data=f'edit_{task_id}_setpriority_Medium')],
-                [InlineKeyboardButton("Low 🟢", callback_data=f'edit_{task_id}_setpriority_Low')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+
             await query.edit_message_text(
-                "Select the new priority:",
-                reply_markup=reply_markup
+                f"✅ Task added with {priority} priority!\n"
+                f"All users have been notified."
             )
-        
-        elif action.startswith('setpriority'):
-            new_priority = action.split('_')[1]
-            if task_db.update_task_priority(task_id, new_priority):
-                await query.edit_message_text(f"✅ Priority updated to {new_priority}!")
-                
-                # Notify about the change
-                notification = (
-                    f"✏️ Task updated by {update.effective_user.full_name}:\n\n"
-                    f"*{task['description']}*\n"
-                    f"New priority: {new_priority}"
-                )
-                await notify_all_users(context, notification, exclude_user_id=user_id)
-            else:
-                await query.edit_message_text("⚠️ Failed to update priority. Please try again.")
-            
-            # Clean up context
-            if 'editing_task' in context.user_data:
-                del context.user_data['editing_task']
-            if 'editing_field' in context.user_data:
-                del context.user_data['editing_field']
-        
-        elif action == 'cancel':
-            await query.edit_message_text("Edit operation cancelled.")
-            if 'editing_task' in context.user_data:
-                del context.user_data['editing_task']
-            if 'editing_field' in context.user_data:
-                del context.user_data['editing_field']
+        else:
+            await query.edit_message_text("⚠️ Failed to add task. Please try again.")
+
+        # Clean up context
+        context.user_data.pop('conv', None)
+
+async def _handle_delete(update: Update, context: ContextTypes.DEFAULT_TYPE, query, payload: str):
+    """Handle 'delete_<task_id>'"""
+    task_id = int(payload)
+    # DELETE ... RETURNING hands back the deleted row, so no separate
+    # get_task round-trip is needed
+    task = await asyncio.to_thread(task_db.delete_task_returning, task_id)
+
+    if task:
+        await query.edit_message_text(f"🗑 Task deleted: {task['description']}")
+
+        # Notify about deletion
+        notification = (
+            f"🗑 Task deleted by {update.effective_user.full_name}:\n\n"
+            f"*{task['description']}*"
+        )
+        await notify_all_users(context, notification, exclude_user_id=query.from_user.id)
+    else:
+        await query.edit_message_text("⚠️ Task not found!")
+
+async def _handle_edit(update: Update, context: ContextTypes.DEFAULT_TYPE, query, payload: str):
+    """Handle 'edit_<task_id>_<action>[_<priority>]'"""
+    task_id_str, _, rest = payload.partition('_')
+    task_id = int(task_id_str)
+    action, _, value = rest.partition('_')
+
+    if action in ('sp', 'setpriority'):
+        # Old keyboards spell the priority out; new ones send one digit
+        new_priority = PRIORITY_FROM_CODE.get(value, value)
+        # UPDATE ... RETURNING applies the change and fetches the row
+        # in a single statement
+        task = await asyncio.to_thread(task_db.update_task_priority_returning, task_id, new_priority)
+        if task:
+            await query.edit_message_text(f"✅ Priority updated to {new_priority}!")
+
+            # Notify about the change
+            notification = (
+                f"✏️ Task updated by {update.effective_user.full_name}:\n\n"
+                f"*{task['description']}*\n"
+                f"New priority: {new_priority}"
+            )
+            await notify_all_users(context, notification, exclude_user_id=query.from_user.id)
+        else:
+            await query.edit_message_text("⚠️ Task not found!")
+
+        # Clean up context
+        context.user_data.pop('conv', None)
+        return
+
+    task = await asyncio.to_thread(task_db.get_task, task_id)
+
+    if not task:
+        await query.edit_message_text("⚠️ Task not found!")
+        return
+
+    if action == 'select':
+        await query.edit_message_text(
+            f"What would you like to edit for this task?\n\n"
+            f"Current: *{task['description']}* ({task['priority']} priority)",
+            reply_markup=edit_options_keyboard(task_id),
+            parse_mode='Markdown'
+        )
+
+    elif action == 'description':
+        context.user_data['conv'] = {'editing_task': task_id, 'editing_field': 'description'}
+        await query.edit_message_text("Please send the new task description:")
+
+    elif action == 'priority':
+        await query.edit_message_text(
+            "Select the new priority:",
+            reply_markup=edit_priority_keyboard(task_id)
+        )
+
+    elif action == 'cancel':
+        await query.edit_message_text("Edit operation cancelled.")
+        context.user_data.pop('conv', None)
+
+# One hash lookup on the callback prefix instead of a startswith chain
+# and repeated split('_') scans
+_CALLBACK_HANDLERS = {
+    'priority': _handle_priority,
+    'delete': _handle_delete,
+    'edit': _handle_edit,
+}
+
+# At most two in-flight callback chains per user; further taps are
+# acknowledged and dropped instead of stacking DB and API work
+_user_semaphores = defaultdict(lambda: asyncio.Semaphore(2))
+
+# Serializes mutation of one user's conversation state while updates
+# from different users run concurrently
+_user_locks = defaultdict(asyncio.Lock)
+
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+
+    semaphore = _user_semaphores[query.from_user.id]
+    if semaphore.locked():
+        await query.answer("Processing…")
+        return
+
+    async with semaphore:
+        # The answer ACK doesn't depend on the handler's DB work, so let
+        # its round-trip overlap with it
+        answer_task = asyncio.create_task(query.answer())
+        try:
+            kind, _, payload = query.data.partition('_')
+            handler = _CALLBACK_HANDLERS.get(kind)
+            if handler:
+                async with _user_locks[query.from_user.id]:
+                    await handler(update, context, query, payload)
+        finally:
+            await answer_task
 
 async def receive_edit_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if 'editing_task' in context.user_data and 'editing_field' in context.user_data:
-        task_id = context.user_data['editing_task']
+    conv = context.user_data.get('conv')
+    if conv and 'editing_task' in conv:
+        task_id = conv['editing_task']
         new_description = update.message.text
-        task = task_db.get_task(task_id)
-        
-        if task and context.user_data['editing_field'] == 'description':
-            if task_db.update_task_description(task_id, new_description):
+        task = await asyncio.to_thread(task_db.get_task, task_id)
+
+        if task and conv.get('editing_field') == 'description':
+            if await asyncio.to_thread(task_db.update_task_description, task_id, new_description):
                 await update.message.reply_text("✅ Task description updated!")
                 
                 # Notify about the change
@@ -252,45 +367,57 @@ async def receive_edit_description(update: Update, context: ContextTypes.DEFAULT
                     f"Old: {task['description']}\n"
                     f"New: *{new_description}*"
                 )
-                await notify_all_users(context, notification, exclude_user_id=str(update.effective_user.id))
+                await notify_all_users(context, notification, exclude_user_id=update.effective_user.id)
             else:
                 await update.message.reply_text("⚠️ Failed to update description. Please try again.")
             
             # Clean up context
-            del context.user_data['editing_task']
-            del context.user_data['editing_field']
+            context.user_data.pop('conv', None)
+
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route free-text messages based on the user's pending state"""
+    async with _user_locks[update.effective_user.id]:
+        conv = context.user_data.get('conv')
+        if not conv:
+            return
+        if conv.get('awaiting_task'):
+            await receive_task_description(update, context)
+        elif conv.get('editing_field') == 'description':
+            await receive_edit_description(update, context)
 
 async def list_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    tasks = task_db.get_all_tasks()
-    
+    tasks = await asyncio.to_thread(task_db.get_all_tasks)
+
     if not tasks:
         await update.message.reply_text("No tasks yet! Use /add to create the first one.")
         return
     
-    message = "📋 *Shared Task List* 📋\n\n"
-    for task in tasks:
-        priority_icon = '🔴' if task['priority'] == 'High' else '🟡' if task['priority'] == 'Medium' else '🟢'
-        creator = f" (by {task['created_by']})" if task['created_by'] else ""
-        message += f"{task['id']}. {priority_icon} *{task['description']}*{creator}\n"
-    
+    lines = [
+        f"{task['id']}. {PRIORITY_ICON[task['priority']]} *{task['description']}*"
+        + (f" (by {task['created_by']})" if task['created_by'] else "")
+        for task in tasks
+    ]
+    message = "📋 *Shared Task List* 📋\n\n" + "\n".join(lines) + "\n"
+
     await update.message.reply_text(message, parse_mode='Markdown')
 
 async def edit_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    tasks = task_db.get_all_tasks()
-    
+    # Summaries come pre-truncated from SQL, so long descriptions never
+    # leave the database just to become 20-char button labels
+    tasks = await asyncio.to_thread(task_db.get_task_summaries)
+
     if not tasks:
         await update.message.reply_text("No tasks to edit yet! Use /add to create one.")
         return
-    
-    keyboard = []
-    for task in tasks:
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{task['id']}. {task['description'][:20]}... ({task['priority']})",
-                callback_data=f'edit_{task["id"]}_select'
-            )
-        ])
-    
+
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{task['id']}. {task['description']}... ({task['priority']})",
+            callback_data=_edit_select_cb(task['id'])
+        )]
+        for task in tasks
+    ]
+
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text(
         "Select a task to edit:",
@@ -298,27 +425,38 @@ async def edit_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    tasks = task_db.get_all_tasks()
-    
+    tasks = await asyncio.to_thread(task_db.get_task_summaries)
+
     if not tasks:
         await update.message.reply_text("No tasks to delete yet! Use /add to create one.")
         return
-    
-    keyboard = []
-    for task in tasks:
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{task['id']}. {task['description'][:20]}...",
-                callback_data=f'delete_{task["id"]}'
-            )
-        ])
-    
+
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{task['id']}. {task['description']}...",
+            callback_data=_delete_cb(task['id'])
+        )]
+        for task in tasks
+    ]
+
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text(
         "Select a task to delete:",
         reply_markup=reply_markup
     )
 
+# Upper bound on concurrently running handlers, so an update burst
+# cannot monopolize the event loop, SQLite, or Telegram's rate budget
+_HANDLER_SEMAPHORE = asyncio.Semaphore(20)
+
+def bounded(handler):
+    """Cap how many instances of a handler may run at once"""
+    @wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        async with _HANDLER_SEMAPHORE:
+            return await handler(update, context)
+    return wrapper
+
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.error(msg="Exception while handling an update:", exc_info=context.error)
     if update and update.message:
@@ -330,34 +468,59 @@ def setup_bot():
     if not token:
         raise ValueError("TELEGRAM_BOT_TOKEN environment variable not set")
     
-    # Create Application
-    application = Application.builder().token(token).build()
+    # Restore known users so notifications keep reaching everyone after
+    # a restart, not just users who /start again
+    active_users.update(task_db.all_user_ids())
+
+    # Create Application; the HTTPX pool is sized for parallel callbacks
+    # so handlers wait on Telegram, not on a free connection, and
+    # updates are dispatched concurrently instead of serially
+    application = (
+        Application.builder()
+        .token(token)
+        .post_init(start_health_server)
+        .connection_pool_size(256)
+        .pool_timeout(30)
+        .connect_timeout(10)
+        .read_timeout(30)
+        .get_updates_connection_pool_size(1)
+        # Token-bucket pacing of every outbound API call (~30/s overall),
+        # so senders wait for capacity instead of bouncing off 429s
+        .rate_limiter(AIORateLimiter(max_retries=3))
+        .concurrent_updates(256)
+        .build()
+    )
     
     # Add handlers
-    application.add_handler(CommandHandler('start', start))
-    application.add_handler(CommandHandler('help', help_command))
-    application.add_handler(CommandHandler('add', add_task))
-    application.add_handler(CommandHandler('list', list_tasks))
-    application.add_handler(CommandHandler('edit', edit_task))
-    application.add_handler(CommandHandler('delete', delete_task))
+    application.add_handler(CommandHandler('start', bounded(start)))
+    application.add_handler(CommandHandler('help', bounded(help_command)))
+    application.add_handler(CommandHandler('add', bounded(add_task)))
+    application.add_handler(CommandHandler('list', bounded(list_tasks)))
+    application.add_handler(CommandHandler('edit', bounded(edit_task)))
+    application.add_handler(CommandHandler('delete', bounded(delete_task)))
     
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, receive_task_description))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, receive_edit_description))
-    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bounded(handle_text)))
+    application.add_handler(CallbackQueryHandler(bounded(button_callback)))
     
     application.add_error_handler(error_handler)
     
     return application
 
-def run_flask():
-    port = int(os.getenv('PORT', 8000))
-    app.run(host='0.0.0.0', port=port)
-
 if __name__ == '__main__':
-    # Start Flask server in a separate thread
-    flask_thread = Thread(target=run_flask)
-    flask_thread.start()
-    
-    # Start Telegram bot
+    # Start Telegram bot; the health server is started via post_init on
+    # the same event loop
     application = setup_bot()
-    application.run_polling()
+
+    # With a public URL configured Telegram pushes updates to us,
+    # removing the getUpdates long-poll round-trips; otherwise fall back
+    # to polling for local runs
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if webhook_url:
+        application.run_webhook(
+            listen='0.0.0.0',
+            port=int(os.getenv('WEBHOOK_PORT', 8443)),
+            url_path='telegram',
+            webhook_url=f"{webhook_url.rstrip('/')}/telegram"
+        )
+    else:
+        application.run_polling()